@@ -1,13 +1,31 @@
 import os
+import re
+import math
 import json
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import hmac
+import hashlib
+import functools
+from dataclasses import dataclass
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, abort
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-import pandas as pd
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.engine import Engine
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import check_password_hash, generate_password_hash
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
 
 app = Flask(__name__)
 app.secret_key = os.getenv("verdant157", "override")
 
+# ---- Templates: only re-check template files when debugging ----
+DEBUG = os.getenv("FLASK_DEBUG", "0") == "1"
+if not DEBUG:
+    app.config["TEMPLATES_AUTO_RELOAD"] = False
+    app.jinja_env.auto_reload = False
+    # Compiled templates persist in the temp dir across worker restarts
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
 # ---- Database: prefer DATABASE_URL (e.g., Render Postgres), else local SQLite ----
 basedir = os.path.abspath(os.path.dirname(__file__))
 default_sqlite = f"sqlite:///{os.path.join(basedir, 'app.db')}"
@@ -21,28 +39,24 @@ app.config["SQLALCHEMY_DATABASE_URI"] = db_uri
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Safer engine settings for SQLite under WSGI
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,
-    "connect_args": {"check_same_thread": False},  # allow use across threads
-}
-
-# -----------------------------
-# DATABASE CONFIG
-# -----------------------------
-basedir = os.path.abspath(os.path.dirname(__file__))
-db_path = os.path.join(basedir, "app.db")
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True, "pool_size": 10}
+if db_uri.startswith("sqlite:"):
+    # allow use across threads
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {"check_same_thread": False}
+
+    @event.listens_for(Engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.close()
 
 db = SQLAlchemy(app)
 
-# Create tables at import time so Gunicorn workers have the schema
-with app.app_context():
-    try:
-        db.create_all()
-    except Exception as e:
-        app.logger.warning(f"DB init skipped/failed: {e}")
-
 # -----------------------------
 # MODELS
 # -----------------------------
@@ -55,7 +69,14 @@ class User(db.Model):
     phone_number = db.Column(db.String(30), default="")
     org_email = db.Column(db.String(100), default="")
 
+    # Lazy by default; list views opt into eager loading per query
+    requests = db.relationship("ProduceRequest", back_populates="user", lazy="select")
+    saved_schedules = db.relationship("SavedSchedule", back_populates="user", lazy="select")
+
 class ProduceRequest(db.Model):
+    # Covers "this user's requests, newest first"
+    __table_args__ = (db.Index("ix_req_user_created", "user_id", db.text("created_at DESC")),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
 
@@ -70,39 +91,73 @@ class ProduceRequest(db.Model):
     status = db.Column(db.String(20), default="new")
 
     # Relationship to the user
-    user = db.relationship("User", backref=db.backref("requests", lazy=True))
+    user = db.relationship("User", back_populates="requests")
 
     # NEW CODE: Urgency field
     urgency = db.Column(db.Integer, default=1)  # Shelter can rank 1=low, 5=high, etc.
 
 class SavedSchedule(db.Model):
+    # Covers the saved_schedules listing (filter by user, order by created_at desc)
+    __table_args__ = (db.Index("ix_saved_user_created", "user_id", db.text("created_at DESC")),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     is_favorite = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    diagram = db.Column(db.Text, default="")
-    schedule_json = db.Column(db.Text, default="")
-    user = db.relationship("User", backref=db.backref("saved_schedules", lazy=True))
+    # Potentially large; only loaded when a single schedule is opened
+    diagram = db.deferred(db.Column(db.Text, default=""))
+    schedule_json = db.deferred(db.Column(db.Text, default=""))
+    user = db.relationship("User", back_populates="saved_schedules")
 # -----------------------------
 # APP CONTEXT & DB CREATION
 # -----------------------------
-# This will create tables if they don't exist, each time the app starts.
+# Create tables at import time so Gunicorn workers have the schema. With preload_app this
+# runs once in the master; set DB_CREATE_ALL=0 where the schema is managed separately.
+if os.getenv("DB_CREATE_ALL", "1") == "1":
+    with app.app_context():
+        try:
+            db.create_all()
+            # create_all skips existing tables, so add indexes to older databases explicitly
+            for table in (ProduceRequest.__table__, SavedSchedule.__table__):
+                for index in table.indexes:
+                    index.create(db.engine, checkfirst=True)
+        except Exception as e:
+            app.logger.warning(f"DB init skipped/failed: {e}")
 
 # -----------------------------
 # AUTH HELPERS
 # -----------------------------
+PWD_HASHER = "pbkdf2:sha256:260000"
+# Shape of a werkzeug password hash (method$salt$hash); anything else is a legacy plaintext password
+PWD_HASH_RE = re.compile(r"(pbkdf2|scrypt):[^$]+\$[^$]+\$[^$]+")
+
+def password_matches(user_id, stored_password, password):
+    if PWD_HASH_RE.fullmatch(stored_password):
+        try:
+            return check_password_hash(stored_password, password)
+        except ValueError:
+            pass  # hash-shaped but with unusable method parameters, e.g. "pbkdf2:x$y$z": plaintext
+    # Accounts created before hashing hold the raw password; upgrade them on login
+    if hmac.compare_digest(stored_password.encode(), password.encode()):
+        User.query.filter_by(id=user_id).update(
+            {"password": generate_password_hash(password, method=PWD_HASHER)}
+        )
+        db.session.commit()
+        return True
+    return False
+
 def is_logged_in():
     return "user_id" in session
 
 def current_user():
-    if not is_logged_in():
-        return None
-    return User.query.get(session["user_id"])
+    # Looked up once per request; later calls reuse the same User
+    if "user" not in g:
+        g.user = db.session.get(User, session["user_id"]) if is_logged_in() else None
+    return g.user
 
 def requires_login(f):
-    from functools import wraps
-    @wraps(f)
+    @functools.wraps(f)
     def decorated_function(*args, **kwargs):
         if not is_logged_in():
             flash("Please log in first.")
@@ -113,83 +168,118 @@ def requires_login(f):
 # -----------------------------
 # RECOMMENDATION / SCHEDULING LOGIC
 # -----------------------------
+BASE_PLANTING_DATE = date(2025, 3, 1)
+PLANTING_INTERVAL = timedelta(weeks=1)  # new crops are staggered one week apart
+GROWING_PERIOD = timedelta(weeks=10)
+
+# Square feet each crop needs; read-only so it can be shared across requests
+CROP_SPACE_REQUIREMENTS = MappingProxyType({
+    "Potatoes": 10,
+    "Corn": 12,
+    "Zucchini": 8,
+    "Tomatoes": 6,
+    "Bell Peppers": 6,
+    "Lettuce": 4,
+    "Kale": 4,
+    "Carrots": 5,
+    "Onions": 5,
+})
+
+LEAFY_GREENS_RE = re.compile(r"leafy greens", re.IGNORECASE)
+
+# One match per ";"-separated "name:space:weeks" item; items without exactly three fields are skipped
+EXISTING_CROP_RE = re.compile(r"(?:^|;)([^:;]*):([^:;]*):([^:;]*)(?=;|$)")
+
 def parse_existing_crops(existing_crops_str):
     if not existing_crops_str.strip():
         return []
     crops_data = []
-    items = existing_crops_str.split(";")
-    for item in items:
-        parts = item.split(":")
-        if len(parts) == 3:
-            crop_name = parts[0].strip()
-            try:
-                space = float(parts[1].strip())
-                weeks = float(parts[2].strip())
-            except ValueError:
-                space = 0
-                weeks = 0
-            crops_data.append({
-                "name": crop_name,
-                "space": space,
-                "weeks_grown": weeks
-            })
+    for crop_name, space, weeks in EXISTING_CROP_RE.findall(existing_crops_str):
+        try:
+            space = float(space)
+            weeks = float(weeks)
+        except ValueError:
+            space = 0
+            weeks = 0
+        crops_data.append({
+            "name": crop_name.strip(),
+            "space": space,
+            "weeks_grown": weeks
+        })
     return crops_data
 
-def recommend_crops(num_people, volume_goal, calorie_goal, additional_needs, free_space):
-    crop_space_requirements = {
-        "Potatoes": 10,
-        "Corn": 12,
-        "Zucchini": 8,
-        "Tomatoes": 6,
-        "Bell Peppers": 6,
-        "Lettuce": 4,
-        "Kale": 4,
-        "Carrots": 5,
-        "Onions": 5,
-    }
+@functools.lru_cache(maxsize=8)
+def candidate_crops(high_calorie, high_volume, leafy_greens):
+    # Only three flags drive the candidate list, so each combination is built once.
+    # Returns (crop, square feet) pairs so callers don't look the space up again.
     recommended = []
-
-    if calorie_goal > 2000:
-        recommended.append("Potatoes")
-        recommended.append("Corn")
-    if volume_goal > 10:
-        recommended.append("Zucchini")
-        recommended.append("Tomatoes")
-        recommended.append("Bell Peppers")
-    if "leafy greens" in additional_needs.lower():
-        recommended.append("Lettuce")
-        recommended.append("Kale")
+    if high_calorie:
+        recommended.extend(["Potatoes", "Corn"])
+    if high_volume:
+        recommended.extend(["Zucchini", "Tomatoes", "Bell Peppers"])
+    if leafy_greens:
+        recommended.extend(["Lettuce", "Kale"])
     if not recommended:
         recommended = ["Tomatoes", "Carrots", "Onions"]
+    return tuple((crop, CROP_SPACE_REQUIREMENTS.get(crop, 5)) for crop in recommended)
+
+# Crop sizes are whole square feet, so only floor(free_space) decides what fits, and any
+# space beyond the total of every crop behaves the same.
+MAX_CANDIDATE_SPACE = sum(CROP_SPACE_REQUIREMENTS.values())
+
+def recommend_crops(num_people, volume_goal, calorie_goal, additional_needs, free_space):
+    space = math.floor(min(free_space, MAX_CANDIDATE_SPACE)) if free_space >= 0 else -1
+    return fit_crops(
+        calorie_goal > 2000,
+        volume_goal > 10,
+        LEAFY_GREENS_RE.search(additional_needs) is not None,
+        space
+    )
 
+@functools.lru_cache(maxsize=2048)
+def fit_crops(high_calorie, high_volume, leafy_greens, space):
     final_crops = []
-    space_left = free_space
-    for crop in recommended:
-        req = crop_space_requirements.get(crop, 5)
+    space_left = space
+    for crop, req in candidate_crops(high_calorie, high_volume, leafy_greens):
         if req <= space_left:
             final_crops.append(crop)
             space_left -= req
 
-    return final_crops
+    return tuple(final_crops)
 
 def generate_planting_diagram(existing_crops, recommended_crops, garden_size):
-    diagram = "Garden Layout Diagram\n\n"
-    diagram += f"Total garden size: {garden_size} sq ft\n\n"
-    diagram += "Existing Crops:\n"
-    row_number = 1
-    for ecrop in existing_crops:
-        diagram += f"  Row {row_number} (existing): {ecrop['name']} occupying {ecrop['space']} sq ft\n"
-        row_number += 1
+    lines = [
+        "Garden Layout Diagram",
+        "",
+        f"Total garden size: {garden_size} sq ft",
+        "",
+        "Existing Crops:",
+    ]
+    lines.extend(
+        f"  Row {row_number} (existing): {ecrop['name']} occupying {ecrop['space']} sq ft"
+        for row_number, ecrop in enumerate(existing_crops, 1)
+    )
 
     if recommended_crops:
-        diagram += "\nNew Crops:\n"
-        for crop in recommended_crops:
-            diagram += f"  Row {row_number} (new): {crop}\n"
-            row_number += 1
+        lines.append("\nNew Crops:")
+        lines.extend(
+            f"  Row {row_number} (new): {crop}"
+            for row_number, crop in enumerate(recommended_crops, len(existing_crops) + 1)
+        )
     else:
-        diagram += "\nNo space left for new crops.\n"
+        lines.append("\nNo space left for new crops.")
 
-    return diagram
+    return "\n".join(lines) + "\n"
+
+@dataclass(slots=True)
+class ScheduleEntry:
+    # Serialises to the same JSON object as the old per-entry dicts
+    crop: str
+    planting_date: str
+    watering_instructions: str
+    weeding_instructions: str
+    harvest_info: str
+    weather_note: str = ""
 
 def generate_schedule(existing_crops, recommended_crops):
     schedule = []
@@ -198,31 +288,62 @@ def generate_schedule(existing_crops, recommended_crops):
         total_cycle = 12
         weeks_done = ecrop["weeks_grown"]
         weeks_left = max(0, total_cycle - weeks_done)
-        schedule.append({
-            "crop": ecrop["name"] + " (existing)",
-            "planting_date": f"~{int(weeks_done)} weeks ago",
-            "watering_instructions": "Continue watering as normal.",
-            "weeding_instructions": "Weed weekly.",
-            "harvest_info": f"Ready in about {weeks_left} more weeks",
-            "weather_note": ""
-        })
+        schedule.append(ScheduleEntry(
+            crop=ecrop["name"] + " (existing)",
+            planting_date=f"~{int(weeks_done)} weeks ago",
+            watering_instructions="Continue watering as normal.",
+            weeding_instructions="Weed weekly.",
+            harvest_info=f"Ready in about {weeks_left} more weeks"
+        ))
 
     # new
-    base_planting_date = pd.Timestamp("2025-03-01")
-    for i, crop in enumerate(recommended_crops):
-        plant_date = base_planting_date + pd.Timedelta(weeks=i)
-        harvest_date = plant_date + pd.Timedelta(weeks=10)
-        schedule.append({
-            "crop": crop + " (new)",
-            "planting_date": str(plant_date.date()),
-            "watering_instructions": "Water 1 inch/week (adjust if rainy).",
-            "weeding_instructions": "Weed once/week.",
-            "harvest_info": f"Estimated harvest around {harvest_date.date()}",
-            "weather_note": ""
-        })
+    plant_date = BASE_PLANTING_DATE
+    for crop in recommended_crops:
+        harvest_date = plant_date + GROWING_PERIOD
+        schedule.append(ScheduleEntry(
+            crop=crop + " (new)",
+            planting_date=plant_date.isoformat(),
+            watering_instructions="Water 1 inch/week (adjust if rainy).",
+            weeding_instructions="Weed once/week.",
+            harvest_info=f"Estimated harvest around {harvest_date.isoformat()}"
+        ))
+        plant_date += PLANTING_INTERVAL
 
     return schedule
 
+# Numeric plan inputs as (form field, type, default); everything else is free text
+PLAN_NUMERIC_FIELDS = (
+    ("num_people", int, 0),
+    ("volume_goal", float, 0.0),
+    ("calorie_goal", float, 0.0),
+    ("urgency", int, 1),
+    ("garden_size", float, 0.0),
+)
+PLAN_TEXT_FIELDS = ("additional_needs", "shelter_notes", "existing_crops")
+
+def read_plan_form(form):
+    # MultiDict.get returns the default when a value is missing or doesn't parse
+    values = {name: form.get(name, default, type=cast) for name, cast, default in PLAN_NUMERIC_FIELDS}
+    values.update((name, form.get(name, "")) for name in PLAN_TEXT_FIELDS)
+    return values
+
+def build_plan(num_people, volume_goal, calorie_goal, additional_needs, garden_size, existing_crops_str):
+    existing_crops = parse_existing_crops(existing_crops_str)
+    used_space = sum(ec["space"] for ec in existing_crops)
+    free_space = max(0, garden_size - used_space)
+
+    recommended_crops = recommend_crops(
+        num_people,
+        volume_goal,
+        calorie_goal,
+        additional_needs,
+        free_space
+    )
+
+    diagram = generate_planting_diagram(existing_crops, recommended_crops, garden_size)
+    schedule = generate_schedule(existing_crops, recommended_crops)
+    return recommended_crops, diagram, schedule
+
 
 # -----------------------------
 # NEW: HOME PAGE ROUTE
@@ -238,9 +359,13 @@ def home():
 def login():
     if request.method == "POST":
         username = request.form.get("username")
-        password = request.form.get("password")
-        user = User.query.filter_by(username=username).first()
-        if user and user.password == password:
+        password = request.form.get("password", "")
+        user = (
+            User.query.filter_by(username=username)
+            .with_entities(User.id, User.password)
+            .first()
+        )
+        if user and password_matches(user.id, user.password, password):
             session["user_id"] = user.id
             return redirect(url_for("generate_schedule_view"))
         else:
@@ -255,14 +380,14 @@ def register():
         phone_number = request.form.get("phone_number", "")
         org_email = request.form.get("org_email", "")
 
-        existing = User.query.filter_by(username=username).first()
+        existing = User.query.filter_by(username=username).with_entities(User.id).first()
         if existing:
             flash("Username already exists.")
             return redirect(url_for("register"))
 
         new_user = User(
             username=username,
-            password=password,
+            password=generate_password_hash(password, method=PWD_HASHER),
             phone_number=phone_number,
             org_email=org_email
         )
@@ -286,53 +411,75 @@ def health():
 def generate_schedule_view():
     user = current_user()
     if request.method == "POST":
-        num_people = int(request.form.get("num_people", 0))
-        volume_goal = float(request.form.get("volume_goal", 0))
-        calorie_goal = float(request.form.get("calorie_goal", 0))
-        additional_needs = request.form.get("additional_needs", "")
-        shelter_notes = request.form.get("shelter_notes", "")
-        urgency = int(request.form.get("urgency", 1))
-        garden_size = float(request.form.get("garden_size", 0))
-        existing_crops_str = request.form.get("existing_crops", "")
+        form = read_plan_form(request.form)
 
         produce_request = ProduceRequest(
             user_id=user.id,
-            num_people=num_people,
-            volume_goal=volume_goal,
-            calorie_goal=calorie_goal,
-            additional_needs=additional_needs,
-            shelter_notes=shelter_notes,
-            urgency=urgency
+            num_people=form["num_people"],
+            volume_goal=form["volume_goal"],
+            calorie_goal=form["calorie_goal"],
+            additional_needs=form["additional_needs"],
+            shelter_notes=form["shelter_notes"],
+            urgency=form["urgency"]
         )
         db.session.add(produce_request)
         db.session.commit()
 
-        existing_crops = parse_existing_crops(existing_crops_str)
-        used_space = sum(ec["space"] for ec in existing_crops)
-        free_space = max(0, garden_size - used_space)
-
-        recommended_crops = recommend_crops(
-            num_people,
-            volume_goal,
-            calorie_goal,
-            additional_needs,
-            free_space
+        _, diagram, schedule = build_plan(
+            form["num_people"],
+            form["volume_goal"],
+            form["calorie_goal"],
+            form["additional_needs"],
+            form["garden_size"],
+            form["existing_crops"]
         )
 
-        diagram = generate_planting_diagram(existing_crops, recommended_crops, garden_size)
-        schedule = generate_schedule(existing_crops, recommended_crops)
-
         return render_template(
             "schedule_view.html",
             produce_request=produce_request,
             diagram=diagram,
             schedule=schedule,
+            # Serialised once here; save_schedule stores this string as-is
+            schedule_json=app.json.dumps(schedule),
             allow_save=True
         )
 
     return render_template("schedule_form.html")
 
 
+# The inputs build_plan depends on, in its argument order; only these key the cache and ETag
+PLAN_KEY_FIELDS = ("num_people", "volume_goal", "calorie_goal", "additional_needs", "garden_size", "existing_crops")
+# Plans with more free text than this are built uncached. The body grows with existing_crops,
+# so this caps a cached body at ~50 KB (~50 MB for a full cache).
+MAX_CACHED_PLAN_TEXT = 512
+
+@functools.lru_cache(maxsize=1024)
+def plan_json(plan_key):
+    # plan_key is build_plan's arguments as normalised by read_plan_form
+    recommended_crops, diagram, schedule = build_plan(*plan_key)
+    return app.json.dumps({"schedule": schedule, "diagram": diagram, "crops": recommended_crops})
+
+@app.route("/api/plan", methods=["GET", "POST"])
+@requires_login
+def api_plan():
+    # JSON version of generate_schedule_view for API clients; nothing is stored.
+    # GET takes the plan fields as query parameters and can be revalidated with If-None-Match;
+    # POST takes them as a form, like generate_schedule_view.
+    form = read_plan_form(request.args if request.method == "GET" else request.form)
+    plan_key = tuple(form[name] for name in PLAN_KEY_FIELDS)
+    etag = hashlib.blake2b(repr(plan_key).encode(), digest_size=16).hexdigest()
+    if etag in request.if_none_match:
+        # 304 only applies to GET; for other methods a matching If-None-Match is a failed
+        # precondition (RFC 9110, 13.1.2)
+        response = app.response_class(status=304 if request.method == "GET" else 412)
+    elif len(form["existing_crops"]) + len(form["additional_needs"]) <= MAX_CACHED_PLAN_TEXT:
+        response = app.response_class(plan_json(plan_key), mimetype="application/json")
+    else:
+        response = app.response_class(plan_json.__wrapped__(plan_key), mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
 @app.route("/save_schedule", methods=["POST"])
 @requires_login
 def save_schedule():
@@ -358,21 +505,25 @@ def save_schedule():
 @requires_login
 def saved_schedules():
     user = current_user()
-    schedules = (
-        SavedSchedule.query.filter_by(user_id=user.id)
+    # Plain rows with just what the list shows; the large text columns stay in the DB
+    schedules = db.session.execute(
+        select(SavedSchedule.id, SavedSchedule.name, SavedSchedule.is_favorite, SavedSchedule.created_at)
+        .where(SavedSchedule.user_id == user.id)
         .order_by(SavedSchedule.created_at.desc())
-        .all()
-    )
+    ).all()
     return render_template("schedules.html", schedules=schedules)
 
 
 @app.route("/schedules/<int:schedule_id>")
 @requires_login
 def view_schedule(schedule_id):
-    sched = SavedSchedule.query.get_or_404(schedule_id)
-    if sched.user_id != current_user().id:
-        flash("Unauthorized")
-        return redirect(url_for("saved_schedules"))
+    # Other users' schedules 404 just like missing ones
+    sched = db.session.execute(
+        select(SavedSchedule.diagram, SavedSchedule.schedule_json)
+        .where(SavedSchedule.id == schedule_id, SavedSchedule.user_id == current_user().id)
+    ).first()
+    if sched is None:
+        abort(404)
     try:
         schedule = json.loads(sched.schedule_json) if sched.schedule_json else []
     except Exception:
@@ -388,11 +539,13 @@ def view_schedule(schedule_id):
 @app.route("/schedules/<int:schedule_id>/toggle_favorite", methods=["POST"])
 @requires_login
 def toggle_favorite(schedule_id):
-    sched = SavedSchedule.query.get_or_404(schedule_id)
-    if sched.user_id != current_user().id:
-        flash("Unauthorized")
-        return redirect(url_for("saved_schedules"))
-    sched.is_favorite = not sched.is_favorite
+    result = db.session.execute(
+        update(SavedSchedule)
+        .where(SavedSchedule.id == schedule_id, SavedSchedule.user_id == current_user().id)
+        .values(is_favorite=~SavedSchedule.is_favorite)
+    )
+    if result.rowcount == 0:
+        abort(404)
     db.session.commit()
     return redirect(url_for("saved_schedules"))
 
@@ -400,11 +553,12 @@ def toggle_favorite(schedule_id):
 @app.route("/schedules/<int:schedule_id>/delete", methods=["POST"])
 @requires_login
 def delete_schedule(schedule_id):
-    sched = SavedSchedule.query.get_or_404(schedule_id)
-    if sched.user_id != current_user().id:
-        flash("Unauthorized")
-        return redirect(url_for("saved_schedules"))
-    db.session.delete(sched)
+    result = db.session.execute(
+        delete(SavedSchedule)
+        .where(SavedSchedule.id == schedule_id, SavedSchedule.user_id == current_user().id)
+    )
+    if result.rowcount == 0:
+        abort(404)
     db.session.commit()
     flash("Schedule deleted.")
     return redirect(url_for("saved_schedules"))
@@ -413,6 +567,5 @@ def delete_schedule(schedule_id):
 # MAIN
 # -----------------------------
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
+    # Production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=DEBUG, threaded=True)
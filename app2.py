@@ -2,167 +2,232 @@
 # advanced_schedule_helper.py
 #############################################
 import os
+import functools
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import tensorflow as tf
 from transformers import GPT2Tokenizer, TFGPT2LMHeadModel
 
 ALLOCATION_MODEL_PATH = os.path.join(os.path.dirname(__file__), "allocation_model.h5")
+# int8 copy of the .h5 exported by trainModel.ipynb; preferred over the .h5 when present
+ALLOCATION_TFLITE_PATH = os.path.join(os.path.dirname(__file__), "allocation_model.tflite")
+# Allocation model signature: 8 features in, 1 fraction out (see generate_full_schedule)
+ALLOCATION_NUM_FEATURES = 8
 TEXT_MODEL_DIR = os.path.join(os.path.dirname(__file__), "text_generation_model")
+# Optional int8 ONNX export of the text model (see README); used instead of TF when present
+TEXT_MODEL_INT8_DIR = os.path.join(os.path.dirname(__file__), "gpt2_int8")
 
-# Load numeric model
-allocation_model = tf.keras.models.load_model(ALLOCATION_MODEL_PATH)
+# Optional per-process GPU memory cap in MB (e.g. 6144) when several processes share a GPU
+GPU_MEMORY_LIMIT_MB = int(os.getenv("TF_GPU_MEMORY_LIMIT_MB", "0"))
 
-# Load GPT-2 model & tokenizer
-tokenizer = GPT2Tokenizer.from_pretrained(TEXT_MODEL_DIR)
-gpt_model = TFGPT2LMHeadModel.from_pretrained(TEXT_MODEL_DIR)
+gpus = tf.config.list_physical_devices("GPU")
+# Grow GPU memory on demand rather than reserving all of it up front, so both models
+# (and other processes) fit on one device. TF allows either growth or a fixed cap per GPU.
+# Must run before anything initializes the GPUs.
+for gpu in gpus:
+    if GPU_MEMORY_LIMIT_MB:
+        tf.config.set_logical_device_configuration(
+            gpu, [tf.config.LogicalDeviceConfiguration(memory_limit=GPU_MEMORY_LIMIT_MB)]
+        )
+    else:
+        tf.config.experimental.set_memory_growth(gpu, True)
 
-def generate_text_instructions(prompt: str, max_length=250) -> str:
-    """
-    Generate step-by-step schedule instructions from GPT-2,
-    based on real data training.
-    """
-    input_ids = tokenizer.encode(prompt, return_tensors="tf")
-    output_sequences = gpt_model.generate(
-        input_ids=input_ids,
-        max_length=max_length,
-        temperature=0.8,
-        top_p=0.95,
-        do_sample=True
-    )
-    text = tokenizer.decode(output_sequences[0], skip_special_tokens=True)
-    return text
+# fp16 compute on GPUs (tensor cores); must be set before the models are built.
+# CPUs stay in float32 -- use intel-tensorflow-avx512 there instead (see README).
+if gpus:
+    tf.keras.mixed_precision.set_global_policy("mixed_float16")
 
-def build_prompt(request_info, weather_info):
-    """
-    Build a prompt that includes relevant numeric features,
-    letting GPT-2 produce a multi-week schedule for that request.
-    """
-    prompt = (
-        f"Provide a detailed multi-week planting and care schedule.\n"
-        f"Request info:\n"
-        f" - Urgency: {request_info.get('urgency', 1)}\n"
-        f" - People: {request_info.get('num_people', 0)}\n"
-        f" - Volume Goal: {request_info.get('volume_goal', 0)}\n"
-        f" - Calorie Goal: {request_info.get('calorie_goal', 0)}\n"
-        f" - Additional Needs: {request_info.get('additional_needs','')}\n"
-        f"Weather forecast:\n"
-        f" - Temperature: {weather_info.get('temperature', 20)} C\n"
-        f" - Rain Probability: {weather_info.get('rain_prob',0.2)*100:.1f}%\n\n"
-        f"Now write the weekly instructions:\n"
-        f"Week 1:"
-    )
-    return prompt
+# Models load lazily on first use, not at import: importing this module stays cheap and
+# forked server workers each load their own copy after the fork.
 
-def generate_full_schedule(requests, weather, free_space):
+@functools.lru_cache(maxsize=1)
+def _allocation_interpreter():
     """
-    For each request:
-      1) Predict fraction_of_space with 'allocation_model'
-      2) Generate textual instructions with GPT-2
-    Combine into one global schedule.
+    int8 TFLite interpreter (XNNPACK) for the allocation model, or None if it isn't
+    exported or doesn't have the (?, 8) -> (?, 1) signature the .h5 model has.
     """
-    # Build numeric features for each request
-    # We'll assume each request -> row: [urgency, num_people, volume_goal, calorie_goal, free_space, weather_temp, weather_rain, existing_crops=0]
-    X_inputs = []
-    for req in requests:
-        row = [
-            req.get("urgency",1),
-            req.get("num_people",0),
-            req.get("volume_goal",0),
-            req.get("calorie_goal",0),
-            free_space,  # from admin's total
-            weather.get("temperature",20),
-            weather.get("rain_prob",0.2),
-            0.0  # existing_crops_vector placeholder
-        ]
-        X_inputs.append(row)
-
-    X_inputs = np.array(X_inputs, dtype=float)
-    frac_preds = allocation_model.predict(X_inputs)  # shape: (len(requests),1)
+    if not os.path.exists(ALLOCATION_TFLITE_PATH):
+        return None
+    interpreter = tf.lite.Interpreter(model_path=ALLOCATION_TFLITE_PATH)
+    input_shape = tuple(interpreter.get_input_details()[0]["shape"][1:])
+    output_shape = tuple(interpreter.get_output_details()[0]["shape"][1:])
+    if input_shape != (ALLOCATION_NUM_FEATURES,) or output_shape != (1,):
+        warnings.warn(
+            f"{ALLOCATION_TFLITE_PATH} maps {input_shape} -> {output_shape}, expected "
+            f"({ALLOCATION_NUM_FEATURES},) -> (1,); using {ALLOCATION_MODEL_PATH} instead"
+        )
+        return None
+    interpreter.allocate_tensors()
+    return interpreter
 
-    schedule_res = []
-    used_fraction = 0.0
+@functools.lru_cache(maxsize=1)
+def _allocation_model():
+    return tf.keras.models.load_model(ALLOCATION_MODEL_PATH)
 
-    for i, req in enumerate(requests):
-        fraction = frac_preds[i][0]
-        used_fraction += fraction
-        # Build prompt
-        prompt = build_prompt(req, weather)
-        instructions = generate_text_instructions(prompt, max_length=300)
+# A TFLite interpreter must not be invoked from two threads at once
+_allocation_lock = threading.Lock()
+# Runs predict_allocation alongside GPT-2 decoding in generate_full_schedule
+_allocation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="allocation")
 
-        schedule_res.append({
-            "request_id": req.get("id"),
-            "fraction_space": fraction,
-            "instructions": instructions
-        })
+def predict_allocation(X):
+    """
+    Run the allocation model on a float32 (n, 8) feature matrix.
+    Returns a float32 array of shape (n, 1).
+    """
+    interpreter = _allocation_interpreter()
+    if interpreter is None:
+        # Direct call: a single forward pass without predict()'s batching/callback machinery
+        return _allocation_model()(tf.constant(X), training=False).numpy().astype(np.float32)
+    if len(X) == 0:
+        return np.empty((0, 1), dtype=np.float32)
+    with _allocation_lock:
+        input_index = interpreter.get_input_details()[0]["index"]
+        output_index = interpreter.get_output_details()[0]["index"]
+        # Resize the batch dimension to the number of requests (no-op when unchanged)
+        if tuple(interpreter.get_input_details()[0]["shape"]) != X.shape:
+            interpreter.resize_tensor_input(input_index, X.shape)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_index, X)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index).astype(np.float32)
 
-    # Combine into a single textual output
-    master_text = "=== COMPREHENSIVE SCHEDULE ===\n\n"
-    for r in schedule_res:
-        master_text += f"Request {r['request_id']} -> fraction {r['fraction_space']*100:.1f}%\n"
-        master_text += f"{r['instructions']}\n\n"
-    master_text += f"Total fraction used: {used_fraction*100:.1f}%\n\n"
-
-    return {
-        "schedule_list": schedule_res,
-        "master_text": master_text
-    }
+@functools.lru_cache(maxsize=1)
+def _tokenizer():
+    tokenizer = GPT2Tokenizer.from_pretrained(TEXT_MODEL_DIR)
+    # GPT-2 has no pad token; pad on the left so every prompt ends right where generation starts
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    return tokenizer
 
+@functools.lru_cache(maxsize=1)
+def _ort_gpt_model():
+    """
+    ONNX Runtime int8 decode (VNNI GEMMs on x86), or None unless both the
+    quantized export and optimum are available.
+    """
+    if not os.path.isdir(TEXT_MODEL_INT8_DIR):
+        return None
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError:
+        return None
+    return ORTModelForCausalLM.from_pretrained(TEXT_MODEL_INT8_DIR)
 
+@functools.lru_cache(maxsize=1)
+def _xla_generate():
+    """
+    XLA-compiled TF GPT-2 generate. It retraces and recompiles for each new
+    (batch, length) input shape; see _xla_batches for how both are bucketed.
+    """
+    gpt_model = TFGPT2LMHeadModel.from_pretrained(TEXT_MODEL_DIR)
+    return tf.function(gpt_model.generate, jit_compile=True)
 
-#############################################
-# advanced_schedule_helper.py
-#############################################
-import os
-import numpy as np
-import tensorflow as tf
-from transformers import GPT2Tokenizer, TFGPT2LMHeadModel
+# Prompt lengths are padded up to a multiple of PROMPT_PAD_MULTIPLE tokens, and batch sizes up
+# to a power of two no larger than MAX_XLA_BATCH, so only a handful of shapes are ever compiled.
+PROMPT_PAD_MULTIPLE = 32
+MAX_XLA_BATCH = 16
 
-ALLOCATION_MODEL_PATH = os.path.join(os.path.dirname(__file__), "allocation_model.h5")
-TEXT_MODEL_DIR = os.path.join(os.path.dirname(__file__), "text_generation_model")
+def _xla_batches(prompts):
+    """
+    Split prompts into chunks of at most MAX_XLA_BATCH, each padded (by repeating its
+    last prompt) to a power-of-two size. Yields (padded chunk, number of real prompts).
+    """
+    for start in range(0, len(prompts), MAX_XLA_BATCH):
+        chunk = prompts[start:start + MAX_XLA_BATCH]
+        bucket = 1 << (len(chunk) - 1).bit_length()
+        yield chunk + [chunk[-1]] * (bucket - len(chunk)), len(chunk)
 
-# Load numeric model
-allocation_model = tf.keras.models.load_model(ALLOCATION_MODEL_PATH)
+def generate_text_instructions_batch(prompts, max_new_tokens=200):
+    """
+    Generate instructions for several prompts with batched GPT-2 decodes
+    (up to MAX_XLA_BATCH prompts each) instead of one generate() call per prompt.
+    """
+    if not prompts:
+        return []
+    tokenizer = _tokenizer()
+    ort_gpt_model = _ort_gpt_model()
+    generation_kwargs = dict(
+        max_new_tokens=max_new_tokens,
+        temperature=0.8,
+        top_k=40,
+        top_p=0.92,
+        do_sample=True,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.eos_token_id
+    )
+    if ort_gpt_model is not None:
+        encoded = tokenizer(prompts, return_tensors="pt", padding=True)
+        output_sequences = ort_gpt_model.generate(
+            input_ids=encoded["input_ids"],
+            attention_mask=encoded["attention_mask"],
+            **generation_kwargs
+        )
+        return tokenizer.batch_decode(output_sequences, skip_special_tokens=True)
 
-# Load GPT-2 model & tokenizer
-tokenizer = GPT2Tokenizer.from_pretrained(TEXT_MODEL_DIR)
-gpt_model = TFGPT2LMHeadModel.from_pretrained(TEXT_MODEL_DIR)
+    xla_generate = _xla_generate()
+    texts = []
+    for batch, n_real in _xla_batches(prompts):
+        encoded = tokenizer(
+            batch,
+            return_tensors="tf",
+            padding=True,
+            pad_to_multiple_of=PROMPT_PAD_MULTIPLE
+        )
+        output_sequences = xla_generate(
+            input_ids=encoded["input_ids"],
+            attention_mask=encoded["attention_mask"],
+            **generation_kwargs
+        )
+        # Drop the outputs of the filler prompts
+        texts.extend(tokenizer.batch_decode(output_sequences[:n_real], skip_special_tokens=True))
+    return texts
 
-def generate_text_instructions(prompt: str, max_length=250) -> str:
+def generate_text_instructions(prompt: str, max_new_tokens=200) -> str:
     """
     Generate step-by-step schedule instructions from GPT-2,
     based on real data training.
     """
-    input_ids = tokenizer.encode(prompt, return_tensors="tf")
-    output_sequences = gpt_model.generate(
-        input_ids=input_ids,
-        max_length=max_length,
-        temperature=0.8,
-        top_p=0.95,
-        do_sample=True
-    )
-    text = tokenizer.decode(output_sequences[0], skip_special_tokens=True)
-    return text
+    return generate_text_instructions_batch([prompt], max_new_tokens=max_new_tokens)[0]
+
+PROMPT_TEMPLATE = (
+    "Provide a detailed multi-week planting and care schedule.\n"
+    "Request info:\n"
+    " - Urgency: {urgency}\n"
+    " - People: {num_people}\n"
+    " - Volume Goal: {volume_goal}\n"
+    " - Calorie Goal: {calorie_goal}\n"
+    " - Additional Needs: {additional_needs}\n"
+    "Weather forecast:\n"
+    " - Temperature: {temperature} C\n"
+    " - Rain Probability: {rain_pct:.1f}%\n\n"
+    "Now write the weekly instructions:\n"
+    "Week 1:"
+)
 
 def build_prompt(request_info, weather_info):
     """
     Build a prompt that includes relevant numeric features,
     letting GPT-2 produce a multi-week schedule for that request.
     """
-    prompt = (
-        f"Provide a detailed multi-week planting and care schedule.\n"
-        f"Request info:\n"
-        f" - Urgency: {request_info.get('urgency', 1)}\n"
-        f" - People: {request_info.get('num_people', 0)}\n"
-        f" - Volume Goal: {request_info.get('volume_goal', 0)}\n"
-        f" - Calorie Goal: {request_info.get('calorie_goal', 0)}\n"
-        f" - Additional Needs: {request_info.get('additional_needs','')}\n"
-        f"Weather forecast:\n"
-        f" - Temperature: {weather_info.get('temperature', 20)} C\n"
-        f" - Rain Probability: {weather_info.get('rain_prob',0.2)*100:.1f}%\n\n"
-        f"Now write the weekly instructions:\n"
-        f"Week 1:"
-    )
-    return prompt
+    return PROMPT_TEMPLATE.format_map({
+        "urgency": request_info.get("urgency", 1),
+        "num_people": request_info.get("num_people", 0),
+        "volume_goal": request_info.get("volume_goal", 0),
+        "calorie_goal": request_info.get("calorie_goal", 0),
+        "additional_needs": request_info.get("additional_needs",""),
+        "temperature": weather_info.get("temperature", 20),
+        "rain_pct": weather_info.get("rain_prob",0.2)*100,
+    })
+
+# Per-request feature columns 0-3 of the allocation model input: (request key, default)
+REQUEST_FEATURES = (
+    ("urgency", 1),
+    ("num_people", 0),
+    ("volume_goal", 0),
+    ("calorie_goal", 0),
+)
 
 def generate_full_schedule(requests, weather, free_space):
     """
@@ -173,22 +238,25 @@ def generate_full_schedule(requests, weather, free_space):
     """
     # Build numeric features for each request
     # We'll assume each request -> row: [urgency, num_people, volume_goal, calorie_goal, free_space, weather_temp, weather_rain, existing_crops=0]
-    X_inputs = []
-    for req in requests:
-        row = [
-            req.get("urgency",1),
-            req.get("num_people",0),
-            req.get("volume_goal",0),
-            req.get("calorie_goal",0),
-            free_space,  # from admin's total
-            weather.get("temperature",20),
-            weather.get("rain_prob",0.2),
-            0.0  # existing_crops_vector placeholder
-        ]
-        X_inputs.append(row)
-
-    X_inputs = np.array(X_inputs, dtype=float)
-    frac_preds = allocation_model.predict(X_inputs)  # shape: (len(requests),1)
+    n = len(requests)
+    X_inputs = np.empty((n, ALLOCATION_NUM_FEATURES), dtype=np.float32)
+    for col, (key, default) in enumerate(REQUEST_FEATURES):
+        X_inputs[:, col] = np.fromiter((req.get(key, default) for req in requests), dtype=np.float32, count=n)
+    # Shared by every request, so broadcast down the whole column
+    X_inputs[:, 4] = free_space  # from admin's total
+    X_inputs[:, 5] = weather.get("temperature",20)
+    X_inputs[:, 6] = weather.get("rain_prob",0.2)
+    X_inputs[:, 7] = 0.0  # existing_crops_vector placeholder
+
+    # The allocation pass doesn't feed the prompts, so run it on a worker thread
+    # while the prompts are built and GPT-2 decodes (TF releases the GIL in its kernels)
+    frac_future = _allocation_executor.submit(predict_allocation, X_inputs)
+
+    # One batched GPT-2 decode for every request's prompt
+    prompts = [build_prompt(req, weather) for req in requests]
+    all_instructions = generate_text_instructions_batch(prompts)
+
+    frac_preds = frac_future.result()  # shape: (len(requests),1)
 
     schedule_res = []
     used_fraction = 0.0
@@ -196,26 +264,22 @@ def generate_full_schedule(requests, weather, free_space):
     for i, req in enumerate(requests):
         fraction = frac_preds[i][0]
         used_fraction += fraction
-        # Build prompt
-        prompt = build_prompt(req, weather)
-        instructions = generate_text_instructions(prompt, max_length=300)
 
         schedule_res.append({
             "request_id": req.get("id"),
             "fraction_space": fraction,
-            "instructions": instructions
+            "instructions": all_instructions[i]
         })
 
-    # Combine into a single textual output
-    master_text = "=== COMPREHENSIVE SCHEDULE ===\n\n"
+    # Combine into a single textual output (collect the pieces, join once)
+    parts = ["=== COMPREHENSIVE SCHEDULE ===\n\n"]
     for r in schedule_res:
-        master_text += f"Request {r['request_id']} -> fraction {r['fraction_space']*100:.1f}%\n"
-        master_text += f"{r['instructions']}\n\n"
-    master_text += f"Total fraction used: {used_fraction*100:.1f}%\n\n"
+        parts.append(f"Request {r['request_id']} -> fraction {r['fraction_space']*100:.1f}%\n")
+        parts.append(f"{r['instructions']}\n\n")
+    parts.append(f"Total fraction used: {used_fraction*100:.1f}%\n\n")
+    master_text = "".join(parts)
 
     return {
         "schedule_list": schedule_res,
         "master_text": master_text
     }
-
-
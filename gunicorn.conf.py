@@ -0,0 +1,15 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+
+# Import app.py once in the master so workers share its pages copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Don't reuse DB connections opened in the master before the fork
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -3,7 +3,9 @@
 #############################################
 
 import os
+import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 
@@ -12,26 +14,53 @@ DATASET_1 = "tejashvi14/crop-production"
 DATASET_2 = "itssuru/india-rainfall-data"
 DATASET_3 = "miguelaenlle/farm-advice-text"  
 
-def download_from_kaggle(dataset, out_path):
+# (dataset, download dir, CSV read below) -- a dataset is skipped if its CSV is already there
+DOWNLOADS = (
+    (DATASET_1, "data/crop_production", "Crop_production.csv"),
+    (DATASET_2, "data/weather_data", "rainfall.csv"),
+    (DATASET_3, "data/farm_text", "farm_instructions.csv"),
+)
+
+def download_from_kaggle(dataset, out_path, expected_file=None):
     """
     Uses Kaggle CLI to download a dataset into out_path.
+    Does nothing if expected_file already exists in out_path.
     """
+    if expected_file and os.path.exists(os.path.join(out_path, expected_file)):
+        print(f"{dataset}: {expected_file} already present, skipping download")
+        return
     if not os.path.exists(out_path):
         os.makedirs(out_path)
     cmd = f"kaggle datasets download -d {dataset} -p {out_path} --unzip"
     subprocess.run(cmd, shell=True, check=True)
 
-def main():
+def main(write_csv=False):
     print("Downloading real datasets from Kaggle...")
-    download_from_kaggle(DATASET_1, "data/crop_production")
-    download_from_kaggle(DATASET_2, "data/weather_data")
-    download_from_kaggle(DATASET_3, "data/farm_text")
-
-    df_crop = pd.read_csv("data/crop_production/Crop_production.csv")
-
-    df_weather = pd.read_csv("data/weather_data/rainfall.csv")
-
-    df_text = pd.read_csv("data/farm_text/farm_instructions.csv")
+    # The three downloads are independent, so run the CLI calls concurrently
+    with ThreadPoolExecutor(max_workers=len(DOWNLOADS)) as ex:
+        list(ex.map(lambda d: download_from_kaggle(*d), DOWNLOADS))
+
+    # Read only the columns used below, with numeric dtypes given up front (no inference pass);
+    # the pyarrow engine parses each file with multiple threads.
+    df_crop = pd.read_csv(
+        "data/crop_production/Crop_production.csv",
+        engine="pyarrow",
+        usecols=["State", "District", "Crop_Year", "Season", "Crop", "Area", "Production"],
+        dtype={"Area": "float64", "Production": "float64"},
+    )
+
+    df_weather = pd.read_csv(
+        "data/weather_data/rainfall.csv",
+        engine="pyarrow",
+        usecols=["STATE_UT_NAME", "YEAR", "ANNUAL"],
+        dtype={"ANNUAL": "float64"},
+    )
+
+    df_text = pd.read_csv(
+        "data/farm_text/farm_instructions.csv",
+        engine="pyarrow",
+        usecols=["crop", "season", "instructions"],
+    )
 
    
     df_crop = df_crop.rename(columns={
@@ -49,42 +78,60 @@ def main():
 
     df_weather = df_weather.rename(columns={
         'STATE_UT_NAME': 'region',
+        'YEAR': 'year',
         'ANNUAL': 'rainfall_mm'
     })
 
     df_weather = df_weather.dropna(subset=['rainfall_mm'])
 
-    if 'YEAR' in df_weather.columns:
-        df_weather = df_weather.rename(columns={'YEAR': 'year'})
-
-    df_merged = pd.merge(df_crop, df_weather, on=['region','year'], how='inner')
-
-
     df_text = df_text.rename(columns={
         'crop': 'crop',
         'season': 'season',
         'instructions': 'text_instructions'
     })
-    df_final = pd.merge(df_merged, df_text, on=['crop','season'], how='inner')
 
+    # Compact join keys: int32 years, and string keys as categoricals sharing one
+    # category set across both sides of each join (so they hash as integer codes)
+    df_crop['year'] = df_crop['year'].astype('int32')
+    df_weather['year'] = df_weather['year'].astype('int32')
+    for key, frames in (('region', (df_crop, df_weather)),
+                        ('crop', (df_crop, df_text)),
+                        ('season', (df_crop, df_text))):
+        key_dtype = pd.CategoricalDtype(pd.concat([f[key] for f in frames]).dropna().unique())
+        for f in frames:
+            f[key] = f[key].astype(key_dtype)
+
+    # Index-based inner joins on the shared keys
+    df_merged = df_crop.set_index(['region','year']).join(
+        df_weather.set_index(['region','year']), how='inner'
+    ).reset_index()
+
+    df_final = df_merged.set_index(['crop','season']).join(
+        df_text.set_index(['crop','season']), how='inner'
+    ).reset_index()
 
-    df_final['urgency'] = np.random.randint(1, 6, size=len(df_final))
 
-    df_final['num_people'] = (df_final['production_tons'] / 10).apply(lambda x: max(5, min(500, x))) \
-                             + np.random.randint(0,100,len(df_final))
+    # One seeded generator for all synthetic features; the four independent uniform
+    # features come from a single (N, 4) draw of U[0, 1) scaled per column.
+    rng = np.random.default_rng(42)
+    n = len(df_final)
+    noise = rng.uniform(0, 1, (n, 4))
 
-    df_final['volume_goal'] = (df_final['num_people']/100.0) + np.random.uniform(1,50,len(df_final))
+    df_final['urgency'] = rng.integers(1, 6, size=n)
 
-    df_final['calorie_goal'] = np.random.uniform(500,4000,len(df_final)) + df_final['num_people']*2
+    df_final['num_people'] = np.clip(df_final['production_tons'] / 10, 5, 500) \
+                             + rng.integers(0, 100, size=n)
 
-    df_final['free_space'] = df_final['area_hectare']*10 + np.random.uniform(0,2000,len(df_final))
+    df_final['volume_goal'] = (df_final['num_people']/100.0) + (1 + 49*noise[:, 0])
 
-  
-    df_final['weather_temp'] = np.random.uniform(15,35,len(df_final))
+    df_final['calorie_goal'] = (500 + 3500*noise[:, 1]) + df_final['num_people']*2
+
+    df_final['free_space'] = df_final['area_hectare']*10 + 2000*noise[:, 2]
+
+    df_final['weather_temp'] = 15 + 20*noise[:, 3]
 
     # - weather_rain: scaled from rainfall_mm
-    df_final['weather_rain'] = df_final['rainfall_mm']/2000.0
-    df_final.loc[df_final['weather_rain']>1,'weather_rain'] = 1.0  # clamp
+    df_final['weather_rain'] = np.minimum(df_final['rainfall_mm']/2000.0, 1.0)  # clamp
 
     df_final['existing_crops_vector'] = df_final['production_tons'] / 1000.0
 
@@ -119,9 +166,17 @@ def main():
     # Shuffle
     df_result = df_result.sample(frac=1.0, random_state=42).reset_index(drop=True)
 
-    # 10) Save to CSV
-    df_result.to_csv("final_dataset.csv", index=False)
-    print("final_dataset.csv created with shape:", df_result.shape)
+    # 10) Save as zstd-compressed Parquet (keeps dtypes; much smaller and faster to load than CSV)
+    df_result.to_parquet("final_dataset.parquet", compression="zstd", index=False)
+    print("final_dataset.parquet created with shape:", df_result.shape)
+
+    if write_csv:
+        # Legacy CSV export for consumers that can't read Parquet
+        df_result.to_csv("final_dataset.csv", index=False)
+        print("final_dataset.csv created with shape:", df_result.shape)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build final_dataset.parquet from the Kaggle datasets.")
+    parser.add_argument("--csv", action="store_true", help="also write final_dataset.csv")
+    args = parser.parse_args()
+    main(write_csv=args.csv)
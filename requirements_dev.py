@@ -12,3 +12,4 @@ wheel
 transformers<5
 safetensors
 tokenizers>=0.14,<0.21
+pyarrow>=14
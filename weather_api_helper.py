@@ -1,5 +1,16 @@
 import requests
 import datetime
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait on OpenWeatherMap (connect and read) before giving up
+REQUEST_TIMEOUT = 5
+
+# Reuse HTTPS connections to OpenWeatherMap instead of a new handshake per call.
+# Only one host is ever contacted, so one host pool is enough. pool_maxsize caps how many
+# idle keep-alive sockets are kept for concurrent callers in the same process; callers
+# beyond that still connect, their sockets just aren't kept afterwards.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=10))
 
 def get_weather_forecast(api_key, lat, lon):
     """
@@ -15,21 +26,21 @@ def get_weather_forecast(api_key, lat, lon):
         "appid": api_key
     }
 
-    response = requests.get(url, params=params)
+    response = _SESSION.get(url, params=params, timeout=REQUEST_TIMEOUT)
     data = response.json()
 
     # If "daily" is missing, return an empty list or handle gracefully
     if "daily" not in data:
         return []
 
-    forecasts = []
-    for day in data["daily"]:
-        date = datetime.datetime.fromtimestamp(day["dt"]).strftime('%Y-%m-%d')
-        temp = day["temp"]["day"]  # daily average temperature
-        weather_desc = day["weather"][0]["description"]
-        forecasts.append({
-            "date": date,
-            "temp": temp,
-            "weather": weather_desc
-        })
-    return forecasts
+    # One pass over the (~8 entry) daily list; "temp" is the daily average temperature
+    fromtimestamp = datetime.datetime.fromtimestamp
+    return [
+        {
+            "date": fromtimestamp(day["dt"]).strftime('%Y-%m-%d'),
+            "temp": day["temp"]["day"],
+            "weather": day["weather"][0]["description"]
+        }
+        for day in data["daily"]
+    ]
+